@@ -30,12 +30,24 @@ The core layer provides a unified interface that API-specific adapters use
 to convert their formats to Kiro API format.
 """
 
+import hashlib
 import json
-from dataclasses import dataclass, field
+import re
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from itertools import chain
 from typing import Any, Dict, List, Optional, Tuple
 
 from loguru import logger
 
+try:
+    import orjson
+except ImportError:
+    # orjson is optional - stdlib json is used as a fallback
+    orjson = None
+
 from kiro.config import (
     TOOL_DESCRIPTION_MAX_LENGTH,
     FAKE_REASONING_ENABLED,
@@ -47,7 +59,7 @@ from kiro.config import (
 # Data Classes for Unified Message Format
 # ==================================================================================================
 
-@dataclass
+@dataclass(slots=True)
 class UnifiedMessage:
     """
     Unified message format used internally by converters.
@@ -66,9 +78,15 @@ class UnifiedMessage:
     tool_calls: Optional[List[Dict[str, Any]]] = None
     tool_results: Optional[List[Dict[str, Any]]] = None
     images: Optional[List[Dict[str, Any]]] = None
+    
+    def __post_init__(self) -> None:
+        # Roles come from parsed JSON as fresh strings; interning them lets the
+        # frequent role == "user" / "assistant" comparisons succeed on identity
+        if type(self.role) is str:
+            self.role = sys.intern(self.role)
 
 
-@dataclass
+@dataclass(slots=True)
 class UnifiedTool:
     """
     Unified tool format used internally by converters.
@@ -123,17 +141,20 @@ def extract_text_content(content: Any) -> str:
         >>> extract_text_content(None)
         ''
     """
+    # Fast paths for the dominant shapes (plain text and empty messages)
+    if type(content) is str:
+        return content
     if content is None:
         return ""
-    if isinstance(content, str):
-        return content
     if isinstance(content, list):
         text_parts = []
         for item in content:
             if isinstance(item, dict):
-                if item.get("type") == "text":
+                # Look up the block type once per item
+                item_type = item.get("type")
+                if item_type == "text":
                     text_parts.append(item.get("text", ""))
-                elif "text" in item and item.get("type") not in ("image", "image_url"):
+                elif "text" in item and item_type not in ("image", "image_url"):
                     text_parts.append(item["text"])
             elif isinstance(item, str):
                 text_parts.append(item)
@@ -206,10 +227,45 @@ def extract_images_from_content(content: Any) -> List[Dict[str, Any]]:
     return images
 
 
+def _convert_images_to_kiro_format(images: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Converts unified images to Kiro API format.
+    
+    Unified format: {"media_type": "image/jpeg", "data": "..."}
+    Kiro format: {"format": "jpeg", "source": {"bytes": "..."}}
+    
+    Args:
+        images: List of images in unified format
+    
+    Returns:
+        List of images in Kiro format
+    """
+    return [
+        {
+            "format": img.get("media_type", "image/jpeg").rpartition("/")[2],  # "jpeg", "png", etc.
+            "source": {"bytes": img.get("data", "")}
+        }
+        for img in images
+    ]
+
+
 # ==================================================================================================
 # Thinking Mode Support (Fake Reasoning)
 # ==================================================================================================
 
+# Thinking instruction to improve reasoning quality (static, built once at import)
+_THINKING_INSTRUCTION = (
+    "Think in English for better reasoning quality.\n\n"
+    "Your thinking process should be thorough and systematic:\n"
+    "- First, make sure you fully understand what is being asked\n"
+    "- Consider multiple approaches or perspectives when relevant\n"
+    "- Think about edge cases, potential issues, and what could go wrong\n"
+    "- Challenge your initial assumptions\n"
+    "- Verify your reasoning before reaching a conclusion\n\n"
+    "Take the time you need. Quality of thought matters more than speed."
+)
+
+
 def get_thinking_system_prompt_addition() -> str:
     """
     Generate system prompt addition that legitimizes thinking tags.
@@ -240,6 +296,26 @@ def get_thinking_system_prompt_addition() -> str:
     )
 
 
+@lru_cache(maxsize=8)
+def _thinking_prefix(max_tokens: int) -> str:
+    """
+    Builds the thinking tags block prepended by inject_thinking_tags().
+    
+    Only max_tokens varies, so the assembled block is cached per value.
+    
+    Args:
+        max_tokens: Maximum thinking length
+    
+    Returns:
+        Thinking tags block
+    """
+    return (
+        f"<thinking_mode>enabled</thinking_mode>\n"
+        f"<max_thinking_length>{max_tokens}</max_thinking_length>\n"
+        f"<thinking_instruction>{_THINKING_INSTRUCTION}</thinking_instruction>\n\n"
+    )
+
+
 def inject_thinking_tags(content: str) -> str:
     """
     Inject fake reasoning tags into content.
@@ -257,33 +333,100 @@ def inject_thinking_tags(content: str) -> str:
     if not FAKE_REASONING_ENABLED:
         return content
     
-    # Thinking instruction to improve reasoning quality
-    thinking_instruction = (
-        "Think in English for better reasoning quality.\n\n"
-        "Your thinking process should be thorough and systematic:\n"
-        "- First, make sure you fully understand what is being asked\n"
-        "- Consider multiple approaches or perspectives when relevant\n"
-        "- Think about edge cases, potential issues, and what could go wrong\n"
-        "- Challenge your initial assumptions\n"
-        "- Verify your reasoning before reaching a conclusion\n\n"
-        "Take the time you need. Quality of thought matters more than speed."
-    )
-    
-    thinking_prefix = (
-        f"<thinking_mode>enabled</thinking_mode>\n"
-        f"<max_thinking_length>{FAKE_REASONING_MAX_TOKENS}</max_thinking_length>\n"
-        f"<thinking_instruction>{thinking_instruction}</thinking_instruction>\n\n"
-    )
-    
     logger.debug(f"Injecting fake reasoning tags with max_tokens={FAKE_REASONING_MAX_TOKENS}")
     
-    return thinking_prefix + content
+    return _thinking_prefix(FAKE_REASONING_MAX_TOKENS) + content
 
 
 # ==================================================================================================
 # JSON Schema Sanitization
 # ==================================================================================================
 
+# Fields that Kiro API doesn't accept
+_SCHEMA_SKIP_FIELDS = frozenset({
+    "additionalProperties",
+    "$schema",
+    "title",  # Kiro doesn't like title in nested schemas
+    "default",  # Some APIs send default values
+})
+
+# Keywords whose value maps arbitrary names to schemas. The names are user-defined
+# (a property may well be called "title"), so only the values are sanitized.
+_SCHEMA_MAP_KEYWORDS = frozenset({
+    "properties",
+    "patternProperties",
+    "definitions",
+    "$defs",
+    "dependentSchemas",
+})
+
+# LRU cache of sanitized schemas keyed by a digest of the canonical JSON of the input.
+# Tool definitions are resent unchanged on every request, so most lookups hit.
+_SANITIZED_SCHEMA_CACHE: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+_SANITIZED_SCHEMA_CACHE_MAX_SIZE = 2048
+
+
+def _schema_cache_key(schema: Dict[str, Any]) -> bytes:
+    """
+    Builds a compact, content-based cache key for a JSON Schema.
+    
+    The schema is serialized with orjson when available, otherwise with stdlib json,
+    and hashed with BLAKE2b so that cache keys stay small regardless of schema size.
+    Key order is preserved rather than sorted: sanitization merges anyOf options in
+    place, so schemas that differ only in key order can sanitize differently.
+    
+    orjson writes NaN and Infinity as null, which would let such a schema share a
+    key with one containing a real null. Any orjson output containing "null" is
+    therefore serialized again with stdlib json, which writes NaN/Infinity literally.
+    
+    Args:
+        schema: JSON Schema
+    
+    Returns:
+        16-byte digest of the serialized schema
+    
+    Raises:
+        TypeError: If the schema is not JSON-serializable
+    """
+    serialized = orjson.dumps(schema) if orjson is not None else None
+    if serialized is None or b"null" in serialized:
+        serialized = json.dumps(schema, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(serialized, digest_size=16).digest()
+
+
+def _schema_needs_sanitizing(schema: Dict[str, Any]) -> bool:
+    """
+    Checks whether sanitization would change anything in the schema.
+    
+    Read-only pre-scan that mirrors the traversal of _sanitize_json_schema()
+    and stops at the first field that would be removed or rewritten.
+    
+    Args:
+        schema: JSON Schema to check
+    
+    Returns:
+        True if the schema contains fields that Kiro API doesn't accept
+    """
+    stack = [schema]
+    while stack:
+        node = stack.pop()
+        for key, value in node.items():
+            if key in _SCHEMA_SKIP_FIELDS:
+                return True
+            if key == "required" and isinstance(value, list) and len(value) == 0:
+                return True
+            if key == "anyOf" and isinstance(value, list):
+                return True
+            
+            if key in _SCHEMA_MAP_KEYWORDS and isinstance(value, dict):
+                stack.extend(prop for prop in value.values() if isinstance(prop, dict))
+            elif isinstance(value, dict):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(item for item in value if isinstance(item, dict))
+    return False
+
+
 def sanitize_json_schema(schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Sanitizes JSON Schema from fields that Kiro API doesn't accept.
@@ -295,7 +438,50 @@ def sanitize_json_schema(schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     - title field is present in nested schemas
     - anyOf with complex types (simplify to first option)
     
-    This function recursively processes the schema and removes problematic fields.
+    Schemas that are already clean are returned as-is. Other results are memoized
+    in an LRU cache keyed by schema content. In both cases the returned dict may be
+    shared and must be treated as read-only.
+    
+    Args:
+        schema: JSON Schema to sanitize
+    
+    Returns:
+        Sanitized schema (shared, do not mutate)
+    """
+    if not schema:
+        return {}
+    
+    # Fast path: a read-only scan is much cheaper than rebuilding the schema
+    if not _schema_needs_sanitizing(schema):
+        return schema
+    
+    try:
+        cache_key = _schema_cache_key(schema)
+    except (TypeError, ValueError, RecursionError):
+        # Not JSON-serializable (or too deep to serialize) - sanitize without caching
+        return _sanitize_json_schema(schema)
+    
+    cached = _SANITIZED_SCHEMA_CACHE.get(cache_key)
+    if cached is not None:
+        _SANITIZED_SCHEMA_CACHE.move_to_end(cache_key)
+        return cached
+    
+    result = _sanitize_json_schema(schema)
+    _SANITIZED_SCHEMA_CACHE[cache_key] = result
+    if len(_SANITIZED_SCHEMA_CACHE) > _SANITIZED_SCHEMA_CACHE_MAX_SIZE:
+        # Evict the least recently used entry
+        _SANITIZED_SCHEMA_CACHE.popitem(last=False)
+    return result
+
+
+def _sanitize_json_schema(schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Sanitizes JSON Schema from fields that Kiro API doesn't accept (uncached).
+    
+    The schema is walked iteratively with an explicit work stack, so deeply nested
+    schemas don't hit the recursion limit. Each nested schema gets a new (empty)
+    target dict in its parent and is filled when popped from the stack.
+    See sanitize_json_schema() for the list of removed fields.
     
     Args:
         schema: JSON Schema to sanitize
@@ -306,56 +492,69 @@ def sanitize_json_schema(schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     if not schema:
         return {}
     
-    # Fields that Kiro API doesn't accept
-    SKIP_FIELDS = {
-        "additionalProperties",
-        "$schema",
-        "title",  # Kiro doesn't like title in nested schemas
-        "default",  # Some APIs send default values
-    }
+    result: Dict[str, Any] = {}
+    # Pending (source schema, target dict) pairs
+    stack = [(schema, result)]
     
-    result = {}
+    def nested(value: Dict[str, Any]) -> Dict[str, Any]:
+        # Placeholder for a nested schema, filled in a later iteration
+        child: Dict[str, Any] = {}
+        stack.append((value, child))
+        return child
     
-    for key, value in schema.items():
-        # Skip empty required arrays
-        if key == "required" and isinstance(value, list) and len(value) == 0:
-            continue
+    while stack:
+        source, target = stack.pop()
         
-        # Skip fields that Kiro API doesn't support
-        if key in SKIP_FIELDS:
-            continue
-        
-        # Handle anyOf - Kiro may not support complex union types
-        # Simplify by taking the first non-null option
-        if key == "anyOf" and isinstance(value, list):
-            # Find first non-null type
-            for option in value:
-                if isinstance(option, dict):
-                    # Skip {"type": "null"} or {"not": {}}
-                    if option.get("type") == "null" or "not" in option:
-                        continue
-                    # Use this option's properties
-                    sanitized_option = sanitize_json_schema(option)
-                    result.update(sanitized_option)
-                    break
-            continue
-        
-        # Recursively process nested objects
-        if key == "properties" and isinstance(value, dict):
-            result[key] = {
-                prop_name: sanitize_json_schema(prop_value) if isinstance(prop_value, dict) else prop_value
-                for prop_name, prop_value in value.items()
-            }
-        elif isinstance(value, dict):
-            result[key] = sanitize_json_schema(value)
-        elif isinstance(value, list):
-            # Process lists (e.g., oneOf, allOf)
-            result[key] = [
-                sanitize_json_schema(item) if isinstance(item, dict) else item
-                for item in value
-            ]
-        else:
-            result[key] = value
+        # Item iterators for this schema; a selected anyOf option is merged
+        # into the same target, in place of the anyOf key
+        item_iters = [iter(source.items())]
+        while item_iters:
+            for key, value in item_iters[-1]:
+                # Skip empty required arrays
+                if key == "required" and isinstance(value, list) and len(value) == 0:
+                    continue
+                
+                # Skip fields that Kiro API doesn't support
+                if key in _SCHEMA_SKIP_FIELDS:
+                    continue
+                
+                # Handle anyOf - Kiro may not support complex union types
+                # Simplify by taking the first non-null option
+                # (skip {"type": "null"} and {"not": {}})
+                if key == "anyOf" and isinstance(value, list):
+                    option = next(
+                        (
+                            option for option in value
+                            if isinstance(option, dict)
+                            and option.get("type") != "null"
+                            and "not" not in option
+                        ),
+                        None
+                    )
+                    if option:
+                        # Merge the option's fields before continuing with this schema
+                        item_iters.append(iter(option.items()))
+                        break
+                    continue
+                
+                # Nested schemas are queued for processing
+                if key in _SCHEMA_MAP_KEYWORDS and isinstance(value, dict):
+                    target[key] = {
+                        prop_name: nested(prop_value) if isinstance(prop_value, dict) else prop_value
+                        for prop_name, prop_value in value.items()
+                    }
+                elif isinstance(value, dict):
+                    target[key] = nested(value)
+                elif isinstance(value, list):
+                    # Process lists (e.g., oneOf, allOf)
+                    target[key] = [
+                        nested(item) if isinstance(item, dict) else item
+                        for item in value
+                    ]
+                else:
+                    target[key] = value
+            else:
+                item_iters.pop()
     
     return result
 
@@ -385,8 +584,10 @@ def process_tools_with_long_descriptions(
     if not tools:
         return None, ""
     
+    limit = TOOL_DESCRIPTION_MAX_LENGTH
+    
     # If limit is disabled (0), return tools unchanged
-    if TOOL_DESCRIPTION_MAX_LENGTH <= 0:
+    if limit <= 0:
         return tools, ""
     
     tool_documentation_parts = []
@@ -395,13 +596,13 @@ def process_tools_with_long_descriptions(
     for tool in tools:
         description = tool.description or ""
         
-        if len(description) <= TOOL_DESCRIPTION_MAX_LENGTH:
+        if len(description) <= limit:
             # Description is short - leave as is
             processed_tools.append(tool)
         else:
             # Description is too long - move to system prompt
             logger.debug(
-                f"Tool '{tool.name}' has long description ({len(description)} chars > {TOOL_DESCRIPTION_MAX_LENGTH}), "
+                f"Tool '{tool.name}' has long description ({len(description)} chars > {limit}), "
                 f"moving to system prompt"
             )
             
@@ -418,17 +619,19 @@ def process_tools_with_long_descriptions(
             )
             processed_tools.append(processed_tool)
     
+    # All descriptions are short - return the original list
+    if not tool_documentation_parts:
+        return tools, ""
+    
     # Form final documentation
-    tool_documentation = ""
-    if tool_documentation_parts:
-        tool_documentation = (
-            "\n\n---\n"
-            "# Tool Documentation\n"
-            "The following tools have detailed documentation that couldn't fit in the tool definition.\n\n"
-            + "\n\n---\n\n".join(tool_documentation_parts)
-        )
+    tool_documentation = (
+        "\n\n---\n"
+        "# Tool Documentation\n"
+        "The following tools have detailed documentation that couldn't fit in the tool definition.\n\n"
+        + "\n\n---\n\n".join(tool_documentation_parts)
+    )
     
-    return processed_tools if processed_tools else None, tool_documentation
+    return processed_tools, tool_documentation
 
 
 def convert_tools_to_kiro_format(tools: Optional[List[UnifiedTool]]) -> List[Dict[str, Any]]:
@@ -469,6 +672,21 @@ def convert_tools_to_kiro_format(tools: Optional[List[UnifiedTool]]) -> List[Dic
 # Tool Results and Tool Uses Extraction
 # ==================================================================================================
 
+def _tool_result_text(content: Any) -> str:
+    """
+    Extracts tool result text, substituting a placeholder for empty content.
+    
+    Kiro API requires non-empty content in tool results.
+    
+    Args:
+        content: Tool result content (string, list of content blocks or None)
+    
+    Returns:
+        Tool result text or "(empty result)"
+    """
+    return extract_text_content(content) or "(empty result)"
+
+
 def convert_tool_results_to_kiro_format(tool_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Converts unified tool results to Kiro API format.
@@ -476,38 +694,22 @@ def convert_tool_results_to_kiro_format(tool_results: List[Dict[str, Any]]) -> L
     Unified format: {"type": "tool_result", "tool_use_id": "...", "content": "..."}
     Kiro format: {"content": [{"text": "..."}], "status": "success", "toolUseId": "..."}
     
+    Results already in Kiro format (with "toolUseId" key) are passed through as-is.
+    
     Args:
         tool_results: List of tool results in unified format
     
     Returns:
         List of tool results in Kiro format
     """
-    kiro_results = []
-    
-    for result in tool_results:
-        # Check if already in Kiro format (has "toolUseId" key)
-        if "toolUseId" in result:
-            kiro_results.append(result)
-            continue
-        
-        # Convert from unified format
-        content = result.get("content", "")
-        if isinstance(content, str):
-            content_text = content
-        else:
-            content_text = extract_text_content(content)
-        
-        # Ensure content is not empty - Kiro API requires non-empty content
-        if not content_text:
-            content_text = "(empty result)"
-        
-        kiro_results.append({
-            "content": [{"text": content_text}],
+    return [
+        result if "toolUseId" in result else {
+            "content": [{"text": _tool_result_text(result.get("content", ""))}],
             "status": "success",
-            "toolUseId": result.get("tool_use_id", result.get("toolUseId", ""))
-        })
-    
-    return kiro_results
+            "toolUseId": result.get("tool_use_id", "")
+        }
+        for result in tool_results
+    ]
 
 
 def extract_tool_results_from_content(content: Any) -> List[Dict[str, Any]]:
@@ -523,18 +725,69 @@ def extract_tool_results_from_content(content: Any) -> List[Dict[str, Any]]:
     Returns:
         List of tool results in Kiro format
     """
-    tool_results = []
+    if not isinstance(content, list):
+        return []
+    
+    return [
+        {
+            "content": [{"text": _tool_result_text(item.get("content", ""))}],
+            "status": "success",
+            "toolUseId": item.get("tool_use_id", "")
+        }
+        for item in content
+        if isinstance(item, dict) and item.get("type") == "tool_result"
+    ]
+
+
+def _get_kiro_tool_results(msg: UnifiedMessage) -> List[Dict[str, Any]]:
+    """
+    Collects tool results of a message in Kiro API format.
     
-    if isinstance(content, list):
-        for item in content:
-            if isinstance(item, dict) and item.get("type") == "tool_result":
-                tool_results.append({
-                    "content": [{"text": extract_text_content(item.get("content", "")) or "(empty result)"}],
-                    "status": "success",
-                    "toolUseId": item.get("tool_use_id", "")
-                })
+    Uses the message's tool_results field if set, otherwise tool_result blocks
+    in content. Content blocks are converted straight to Kiro format in a
+    single pass, without going through convert_tool_results_to_kiro_format().
+    
+    Args:
+        msg: Message in unified format
+    
+    Returns:
+        List of tool results in Kiro format (empty if there are none)
+    """
+    tool_results = msg.tool_results
+    if tool_results:
+        return convert_tool_results_to_kiro_format(tool_results)
+    return extract_tool_results_from_content(msg.content)
+
+
+# Runs of 19+ digits may be integers outside the 64-bit range, which orjson
+# parses as (lossy) floats instead of exact ints like json.loads()
+_LONG_DIGITS_RE = re.compile(r"\d{19}")
+
+
+def _parse_tool_arguments(arguments: str) -> Any:
+    """
+    Parses tool call arguments from a JSON string.
     
-    return tool_results
+    Uses orjson when available. Input that orjson rejects but stdlib json
+    accepts (e.g. NaN) is re-parsed with stdlib json, and input with integers
+    that may not fit in 64 bits goes straight to stdlib json, so behavior
+    matches json.loads().
+    
+    Args:
+        arguments: JSON string with tool call arguments
+    
+    Returns:
+        Parsed arguments
+    
+    Raises:
+        json.JSONDecodeError: If arguments is not valid JSON
+    """
+    if orjson is not None and not _LONG_DIGITS_RE.search(arguments):
+        try:
+            return orjson.loads(arguments)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(arguments)
 
 
 def extract_tool_uses_from_message(
@@ -565,7 +818,7 @@ def extract_tool_uses_from_message(
                 arguments = func.get("arguments", "{}")
                 # Handle both string (OpenAI) and dict (Anthropic unified) formats
                 if isinstance(arguments, str):
-                    input_data = json.loads(arguments) if arguments else {}
+                    input_data = _parse_tool_arguments(arguments) if arguments else {}
                 else:
                     input_data = arguments if arguments else {}
                 tool_uses.append({
@@ -576,13 +829,15 @@ def extract_tool_uses_from_message(
     
     # From content blocks (Anthropic format)
     if isinstance(content, list):
-        for item in content:
-            if isinstance(item, dict) and item.get("type") == "tool_use":
-                tool_uses.append({
-                    "name": item.get("name", ""),
-                    "input": item.get("input", {}),
-                    "toolUseId": item.get("id", "")
-                })
+        tool_uses += [
+            {
+                "name": item.get("name", ""),
+                "input": item.get("input", {}),
+                "toolUseId": item.get("id", "")
+            }
+            for item in content
+            if isinstance(item, dict) and item.get("type") == "tool_use"
+        ]
     
     return tool_uses
 
@@ -625,12 +880,7 @@ def strip_all_tool_content(messages: List[UnifiedMessage]) -> Tuple[List[Unified
                 total_tool_results_stripped += len(msg.tool_results)
             
             # Create a copy of the message without tool content
-            cleaned_msg = UnifiedMessage(
-                role=msg.role,
-                content=msg.content,
-                tool_calls=None,
-                tool_results=None
-            )
+            cleaned_msg = replace(msg, tool_calls=None, tool_results=None)
             result.append(cleaned_msg)
         else:
             result.append(msg)
@@ -647,6 +897,22 @@ def strip_all_tool_content(messages: List[UnifiedMessage]) -> Tuple[List[Unified
     return result, had_tool_content
 
 
+def _tool_result_id(tool_result: Dict[str, Any]) -> Optional[str]:
+    """
+    Returns the tool call ID a tool result refers to.
+    
+    Supports both unified ("tool_use_id") and Kiro ("toolUseId") format,
+    since tool_results may already be in Kiro format.
+    
+    Args:
+        tool_result: Tool result in unified or Kiro format
+    
+    Returns:
+        Tool call ID or None if missing
+    """
+    return tool_result.get("tool_use_id", tool_result.get("toolUseId"))
+
+
 def ensure_assistant_before_tool_results(messages: List[UnifiedMessage]) -> Tuple[List[UnifiedMessage], bool]:
     """
     Ensures that messages with tool_results have a preceding assistant message with tool_calls.
@@ -657,118 +923,214 @@ def ensure_assistant_before_tool_results(messages: List[UnifiedMessage]) -> Tupl
     
     Since we don't know the original tool name and arguments when the assistant message
     is missing, we cannot create a valid synthetic assistant message. Instead, we strip
-    the tool_results from such messages to avoid Kiro API rejection.
+    the tool_results from such messages to avoid Kiro API rejection. Individual
+    tool_results whose tool_use_id does not match any earlier tool call are stripped too.
     
     Args:
         messages: List of messages in unified format
     
     Returns:
         Tuple of:
-        - List of messages with orphaned tool_results stripped
+        - List of messages with orphaned tool_results stripped (the input list itself
+          if nothing was stripped)
         - Boolean indicating whether any tool_results were stripped (used to skip thinking tag injection)
     """
     if not messages:
         return [], False
     
-    result = []
+    # Output list is allocated lazily on the first stripped message;
+    # if nothing needs stripping the input list is returned as-is
+    result: Optional[List[UnifiedMessage]] = None
     stripped_any_tool_results = False
-    
-    for msg in messages:
-        # Check if this message has tool_results
-        if msg.tool_results:
-            # Check if the previous message is an assistant with tool_calls
-            has_preceding_assistant = (
-                result and
-                result[-1].role == "assistant" and
-                result[-1].tool_calls
-            )
+    # Whether the previous message is an assistant with tool_calls
+    prev_has_tool_calls = False
+    # IDs of all tool calls seen so far (for O(1) matching of tool_results)
+    seen_tool_call_ids = set()
+    
+    for index, msg in enumerate(messages):
+        tool_results = msg.tool_results
+        if tool_results:
+            # Split tool_results into kept and orphaned ones
+            kept_tool_results = []
+            if not prev_has_tool_calls:
+                orphaned = tool_results
+                reason = "no preceding assistant message with tool_calls"
+            else:
+                orphaned = []
+                for tr in tool_results:
+                    if _tool_result_id(tr) in seen_tool_call_ids:
+                        kept_tool_results.append(tr)
+                    else:
+                        orphaned.append(tr)
+                reason = "no matching tool_call"
             
-            if not has_preceding_assistant:
+            if orphaned:
                 # We cannot create a valid synthetic assistant message because we don't know
                 # the original tool name and arguments. Kiro API validates tool names.
                 # Strip the tool_results to avoid "Improperly formed request" error.
                 logger.warning(
-                    f"Stripping {len(msg.tool_results)} orphaned tool_results "
-                    f"(no preceding assistant message with tool_calls). "
-                    f"Tool IDs: {[tr.get('tool_use_id', 'unknown') for tr in msg.tool_results]}"
+                    f"Stripping {len(orphaned)} orphaned tool_results ({reason}). "
+                    f"Tool IDs: {[_tool_result_id(tr) or 'unknown' for tr in orphaned]}"
                 )
                 
-                # Create a copy of the message without tool_results
-                cleaned_msg = UnifiedMessage(
-                    role=msg.role,
-                    content=msg.content,
-                    tool_calls=msg.tool_calls,
-                    tool_results=None  # Strip orphaned tool_results
-                )
-                result.append(cleaned_msg)
+                # Create a copy of the message without orphaned tool_results
+                msg = replace(msg, tool_results=kept_tool_results or None)
                 stripped_any_tool_results = True
-                continue
+                if result is None:
+                    result = list(messages[:index])
         
-        result.append(msg)
+        if result is not None:
+            result.append(msg)
+        prev_has_tool_calls = msg.role == "assistant" and bool(msg.tool_calls)
+        if prev_has_tool_calls:
+            seen_tool_call_ids.update(tc.get("id") for tc in msg.tool_calls)
     
+    if result is None:
+        return messages, False
     return result, stripped_any_tool_results
 
 
+def _merge_run_content(contents: List[Any]) -> Any:
+    """
+    Merges the contents of a run of same-role messages.
+    
+    Text contents are joined with a newline. Once any content in the run is a
+    list, the merged content becomes a list of content blocks and plain text
+    from the other messages is wrapped into text blocks.
+    
+    Args:
+        contents: Contents of consecutive messages (at least one)
+    
+    Returns:
+        Merged content (str or list of content blocks)
+    """
+    # Type-stable runs (the common case) take a single join/chain
+    if all(type(content) is str for content in contents):
+        return "\n".join(contents)
+    if all(type(content) is list for content in contents):
+        return list(chain.from_iterable(contents))
+    
+    text_parts: List[str] = []
+    list_content: Optional[List[Any]] = None
+    for content in contents:
+        if isinstance(content, list):
+            if list_content is None:
+                # Text accumulated so far becomes a single leading text block
+                list_content = [{"type": "text", "text": "\n".join(text_parts)}] if text_parts else []
+            list_content.extend(content)
+        elif list_content is not None:
+            list_content.append({"type": "text", "text": extract_text_content(content)})
+        else:
+            text_parts.append(extract_text_content(content))
+    
+    return list_content if list_content is not None else "\n".join(text_parts)
+
+
+def _concat_non_empty(lists: List[Optional[List[Any]]]) -> List[Any]:
+    """
+    Concatenates the non-empty lists, reusing the list itself if only one is non-empty.
+    
+    Args:
+        lists: Lists to concatenate (None and empty lists are skipped)
+    
+    Returns:
+        Concatenated list (shared with the input if only one list contributes)
+    """
+    non_empty = [items for items in lists if items]
+    if len(non_empty) == 1:
+        return non_empty[0]
+    return list(chain.from_iterable(non_empty))
+
+
+def _merge_message_run(run: List[UnifiedMessage]) -> UnifiedMessage:
+    """
+    Merges a run of consecutive messages with the same role into one message.
+    
+    Args:
+        run: Consecutive messages with the same role (at least one)
+    
+    Returns:
+        The merged message (the input messages are not modified)
+    """
+    first = run[0]
+    if len(run) == 1:
+        return first
+    
+    role = first.role
+    
+    # Merge tool_calls for assistant messages and tool_results for user messages
+    tool_calls = first.tool_calls
+    if role == "assistant":
+        extra_tool_calls = [msg.tool_calls for msg in run[1:] if msg.tool_calls]
+        if extra_tool_calls:
+            tool_calls = _concat_non_empty([tool_calls, *extra_tool_calls])
+    
+    tool_results = first.tool_results
+    if role == "user":
+        extra_tool_results = [msg.tool_results for msg in run[1:] if msg.tool_results]
+        if extra_tool_results:
+            tool_results = _concat_non_empty([tool_results, *extra_tool_results])
+    
+    # Shallow copy of the first message - other fields (e.g. images) are shared
+    return replace(
+        first,
+        content=_merge_run_content([msg.content for msg in run]),
+        tool_calls=tool_calls,
+        tool_results=tool_results
+    )
+
+
 def merge_adjacent_messages(messages: List[UnifiedMessage]) -> List[UnifiedMessage]:
     """
     Merges adjacent messages with the same role.
     
     Kiro API does not accept multiple consecutive messages from the same role.
-    This function merges such messages into one.
+    This function merges such messages into one in a single pass: each run of
+    same-role messages is collected and merged once when the role changes.
+    Text contents are joined with a single newline ("\n").
     
     Args:
         messages: List of messages in unified format
     
     Returns:
-        List of messages with merged adjacent messages
+        List of messages with merged adjacent messages (the input list itself
+        if no adjacent messages share a role)
     """
     if not messages:
         return []
     
+    # Fast path: strictly alternating history needs no merging and no copying
+    previous_role = None
+    for msg in messages:
+        if msg.role == previous_role:
+            break
+        previous_role = msg.role
+    else:
+        return messages
+    
     merged = []
     # Statistics for summary logging
     merge_counts = {"user": 0, "assistant": 0}
     total_tool_calls_merged = 0
     total_tool_results_merged = 0
     
-    for msg in messages:
-        if not merged:
-            merged.append(msg)
-            continue
-        
-        last = merged[-1]
-        if msg.role == last.role:
-            # Merge content
-            if isinstance(last.content, list) and isinstance(msg.content, list):
-                last.content = last.content + msg.content
-            elif isinstance(last.content, list):
-                last.content = last.content + [{"type": "text", "text": extract_text_content(msg.content)}]
-            elif isinstance(msg.content, list):
-                last.content = [{"type": "text", "text": extract_text_content(last.content)}] + msg.content
-            else:
-                last_text = extract_text_content(last.content)
-                current_text = extract_text_content(msg.content)
-                last.content = f"{last_text}\n{current_text}"
+    run = [messages[0]]
+    for msg in messages[1:]:
+        if msg.role == run[0].role:
+            run.append(msg)
             
-            # Merge tool_calls for assistant messages
             if msg.role == "assistant" and msg.tool_calls:
-                if last.tool_calls is None:
-                    last.tool_calls = []
-                last.tool_calls = list(last.tool_calls) + list(msg.tool_calls)
                 total_tool_calls_merged += len(msg.tool_calls)
-            
-            # Merge tool_results for user messages
             if msg.role == "user" and msg.tool_results:
-                if last.tool_results is None:
-                    last.tool_results = []
-                last.tool_results = list(last.tool_results) + list(msg.tool_results)
                 total_tool_results_merged += len(msg.tool_results)
             
             # Count merges by role
             if msg.role in merge_counts:
                 merge_counts[msg.role] += 1
         else:
-            merged.append(msg)
+            merged.append(_merge_message_run(run))
+            run = [msg]
+    merged.append(_merge_message_run(run))
     
     # Log summary if any merges occurred
     total_merges = sum(merge_counts.values())
@@ -811,14 +1173,18 @@ def build_kiro_history(messages: List[UnifiedMessage], model_id: str) -> List[Di
     Returns:
         List of dictionaries for history field in Kiro API
     """
+    if not messages:
+        return []
+    
     history = []
     
     for msg in messages:
-        if msg.role == "user":
-            content = extract_text_content(msg.content)
+        role = msg.role
+        if role == "user":
+            content = msg.content
             
             user_input = {
-                "content": content,
+                "content": extract_text_content(content),
                 "modelId": model_id,
                 "origin": "AI_EDITOR",
             }
@@ -827,25 +1193,14 @@ def build_kiro_history(messages: List[UnifiedMessage], model_id: str) -> List[Di
             user_input_context = {}
             
             # Process images - convert to Kiro format
-            images = msg.images or extract_images_from_content(msg.content)
+            images = msg.images or extract_images_from_content(content)
             if images:
-                kiro_images = []
-                for img in images:
-                    kiro_images.append({
-                        "format": img.get("media_type", "image/jpeg").split("/")[-1],  # "jpeg", "png", etc.
-                        "source": {
-                            "bytes": img.get("data", "")
-                        }
-                    })
-                if kiro_images:
-                    user_input_context["images"] = kiro_images
+                user_input_context["images"] = _convert_images_to_kiro_format(images)
             
             # Process tool_results - convert to Kiro format
-            tool_results = msg.tool_results or extract_tool_results_from_content(msg.content)
-            if tool_results:
-                kiro_tool_results = convert_tool_results_to_kiro_format(tool_results)
-                if kiro_tool_results:
-                    user_input_context["toolResults"] = kiro_tool_results
+            kiro_tool_results = _get_kiro_tool_results(msg)
+            if kiro_tool_results:
+                user_input_context["toolResults"] = kiro_tool_results
             
             # Add context if not empty
             if user_input_context:
@@ -853,13 +1208,12 @@ def build_kiro_history(messages: List[UnifiedMessage], model_id: str) -> List[Di
             
             history.append({"userInputMessage": user_input})
             
-        elif msg.role == "assistant":
-            content = extract_text_content(msg.content)
-            
-            assistant_response = {"content": content}
+        elif role == "assistant":
+            content = msg.content
+            assistant_response = {"content": extract_text_content(content)}
             
             # Process tool_calls
-            tool_uses = extract_tool_uses_from_message(msg.content, msg.tool_calls)
+            tool_uses = extract_tool_uses_from_message(content, msg.tool_calls)
             if tool_uses:
                 assistant_response["toolUses"] = tool_uses
             
@@ -977,24 +1331,14 @@ def build_kiro_payload(
     # Process images in current message - convert to Kiro format
     images = current_message.images or extract_images_from_content(current_message.content)
     if images:
-        kiro_images = []
-        for img in images:
-            kiro_images.append({
-                "format": img.get("media_type", "image/jpeg").split("/")[-1],  # "jpeg", "png", etc.
-                "source": {
-                    "bytes": img.get("data", "")
-                }
-            })
-        if kiro_images:
-            user_input_context["images"] = kiro_images
-            logger.debug(f"Added {len(kiro_images)} images to current message")
+        kiro_images = _convert_images_to_kiro_format(images)
+        user_input_context["images"] = kiro_images
+        logger.debug(f"Added {len(kiro_images)} images to current message")
     
     # Process tool_results in current message
-    tool_results = current_message.tool_results or extract_tool_results_from_content(current_message.content)
-    if tool_results:
-        kiro_tool_results = convert_tool_results_to_kiro_format(tool_results)
-        if kiro_tool_results:
-            user_input_context["toolResults"] = kiro_tool_results
+    kiro_tool_results = _get_kiro_tool_results(current_message)
+    if kiro_tool_results:
+        user_input_context["toolResults"] = kiro_tool_results
     
     # Inject thinking tags if enabled (only for the current/last user message)
     if inject_thinking and current_message.role == "user":
@@ -31,17 +31,75 @@ with connection pooling for better resource management.
 """
 
 import asyncio
+import json
+import math
 from typing import Optional
 
 import httpx
 from fastapi import HTTPException
 from loguru import logger
 
+try:
+    import orjson
+except ImportError:
+    # orjson is optional - stdlib json is used as a fallback
+    orjson = None
+
 from kiro.config import MAX_RETRIES, BASE_RETRY_DELAY, FIRST_TOKEN_MAX_RETRIES, STREAMING_READ_TIMEOUT
 from kiro.auth import KiroAuthManager
 from kiro.utils import get_kiro_headers
 
 
+def _check_finite_floats(data: dict) -> None:
+    """
+    Checks that a request body contains no NaN or Infinity values.
+    
+    orjson silently writes these as null, while stdlib json (with allow_nan=False,
+    as httpx uses it) raises. Checking up front makes both encoders behave the same.
+    
+    Args:
+        data: Request body
+    
+    Raises:
+        ValueError: If the body contains NaN or Infinity
+    """
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        for value in node.values() if isinstance(node, dict) else node:
+            if isinstance(value, (dict, list, tuple)):
+                stack.append(value)
+            elif isinstance(value, float) and not math.isfinite(value):
+                raise ValueError("Out of range float values are not JSON compliant")
+
+
+def _encode_json_body(data: dict) -> bytes:
+    """
+    Serializes a request body to compact UTF-8 JSON.
+    
+    Uses orjson when available, otherwise stdlib json with the same
+    settings httpx uses for json= bodies. Both raise ValueError for
+    NaN or Infinity values.
+    
+    Args:
+        data: Request body
+    
+    Returns:
+        Encoded JSON body
+    
+    Raises:
+        ValueError: If the body contains NaN or Infinity
+    """
+    if orjson is not None:
+        _check_finite_floats(data)
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            # Types orjson doesn't support (e.g. non-str keys) - use stdlib json
+            pass
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+
 class KiroHttpClient:
     """
     HTTP client for Kiro API with retry logic support.
@@ -203,6 +261,9 @@ class KiroHttpClient:
         client = await self._get_client(stream=stream)
         last_error = None
         
+        # Serialize the body once - it is identical for every retry attempt
+        body = _encode_json_body(json_data)
+        
         for attempt in range(max_retries):
             try:
                 # Get current token
@@ -210,10 +271,10 @@ class KiroHttpClient:
                 headers = get_kiro_headers(self.auth_manager, token)
                 
                 if stream:
-                    req = client.build_request(method, url, json=json_data, headers=headers)
+                    req = client.build_request(method, url, content=body, headers=headers)
                     response = await client.send(req, stream=True)
                 else:
-                    response = await client.request(method, url, json=json_data, headers=headers)
+                    response = await client.request(method, url, content=body, headers=headers)
                 
                 # Check status
                 if response.status_code == 200:
@@ -248,6 +248,10 @@ class AwsEventStreamParser:
         ('{"contextUsagePercentage":', 'context_usage'),
     ]
     
+    # Single regex matching any event pattern, so the buffer is scanned once per event
+    _EVENT_RE = re.compile("|".join(re.escape(pattern) for pattern, _ in EVENT_PATTERNS))
+    _EVENT_TYPES = dict(EVENT_PATTERNS)
+    
     def __init__(self):
         """Initializes the parser."""
         self.buffer = ""
@@ -274,18 +278,13 @@ class AwsEventStreamParser:
         
         while True:
             # Find nearest pattern
-            earliest_pos = -1
-            earliest_type = None
-            
-            for pattern, event_type in self.EVENT_PATTERNS:
-                pos = self.buffer.find(pattern)
-                if pos != -1 and (earliest_pos == -1 or pos < earliest_pos):
-                    earliest_pos = pos
-                    earliest_type = event_type
-            
-            if earliest_pos == -1:
+            match = self._EVENT_RE.search(self.buffer)
+            if match is None:
                 break
             
+            earliest_pos = match.start()
+            earliest_type = self._EVENT_TYPES[match.group()]
+            
             # Find JSON end
             json_end = find_matching_brace(self.buffer, earliest_pos)
             if json_end == -1:
@@ -11,6 +11,10 @@ Tests for shared conversion logic used by both OpenAI and Anthropic adapters:
 - Thinking tag injection
 """
 
+import json
+import math
+from collections import OrderedDict
+
 import pytest
 from unittest.mock import patch
 
@@ -29,9 +33,43 @@ from kiro.converters_core import (
     convert_tool_results_to_kiro_format,
     UnifiedMessage,
     UnifiedTool,
+    _schema_cache_key,
 )
 
 
+# ==================================================================================================
+# Shared read-only fixtures
+# ==================================================================================================
+
+@pytest.fixture(scope="module")
+def assistant_tool_call_messages():
+    """
+    Returns three assistant messages, each with a single tool call (call_1..call_3).
+    
+    Shared across the module: tests must not mutate these messages.
+    """
+    return tuple(
+        UnifiedMessage(role="assistant", content="", tool_calls=[
+            {"id": f"call_{i}", "type": "function", "function": {"name": f"tool{i}", "arguments": "{}"}}
+        ])
+        for i in (1, 2, 3)
+    )
+
+
+@pytest.fixture(params=["orjson", "json"])
+def json_backend(request, monkeypatch):
+    """
+    Runs a test once with orjson and once with the stdlib json fallback.
+    
+    The schema cache is replaced with an empty one, so cached results
+    can't leak between the two runs.
+    """
+    backend = pytest.importorskip("orjson") if request.param == "orjson" else None
+    monkeypatch.setattr("kiro.converters_core.orjson", backend)
+    monkeypatch.setattr("kiro.converters_core._SANITIZED_SCHEMA_CACHE", OrderedDict())
+    return request.param
+
+
 # ==================================================================================================
 # Tests for extract_text_content
 # ==================================================================================================
@@ -181,8 +219,8 @@ class TestMergeAdjacentMessages:
         
         print(f"Comparing length: Expected 1, Got {len(result)}")
         assert len(result) == 1
-        assert "Hello" in result[0].content
-        assert "World" in result[0].content
+        print(f"Comparing content: Expected 'Hello\\nWorld', Got {result[0].content!r}")
+        assert result[0].content == "Hello\nWorld"
     
     def test_preserves_alternating_messages(self):
         """
@@ -202,6 +240,25 @@ class TestMergeAdjacentMessages:
         print(f"Comparing length: Expected 3, Got {len(result)}")
         assert len(result) == 3
     
+    def test_returns_same_list_when_nothing_to_merge(self):
+        """
+        What it does: Verifies that a strictly alternating history is returned as-is.
+        Purpose: Ensure the no-merge fast path does not copy messages or the list.
+        """
+        print("Setup: Alternating messages...")
+        messages = [
+            UnifiedMessage(role="user", content="Hello"),
+            UnifiedMessage(role="assistant", content="Hi"),
+            UnifiedMessage(role="user", content="How are you?")
+        ]
+        
+        print("Action: Merging messages...")
+        result = merge_adjacent_messages(messages)
+        
+        print("Checking that the input list is returned unchanged...")
+        assert result is messages
+        assert [m.content for m in result] == ["Hello", "Hi", "How are you?"]
+    
     def test_handles_empty_list(self):
         """
         What it does: Verifies empty list handling.
@@ -320,23 +377,13 @@ class TestMergeAdjacentMessages:
         assert "tooluse_first" in tool_ids
         assert "tooluse_second" in tool_ids
     
-    def test_merges_three_adjacent_assistant_tool_calls(self):
+    def test_merges_three_adjacent_assistant_tool_calls(self, assistant_tool_call_messages):
         """
         What it does: Verifies merging of tool_calls from three assistant messages.
         Purpose: Ensure all tool_calls are preserved when merging more than two messages.
         """
         print("Setup: Three assistant messages with tool_calls...")
-        messages = [
-            UnifiedMessage(role="assistant", content="", tool_calls=[
-                {"id": "call_1", "type": "function", "function": {"name": "tool1", "arguments": "{}"}}
-            ]),
-            UnifiedMessage(role="assistant", content="", tool_calls=[
-                {"id": "call_2", "type": "function", "function": {"name": "tool2", "arguments": "{}"}}
-            ]),
-            UnifiedMessage(role="assistant", content="", tool_calls=[
-                {"id": "call_3", "type": "function", "function": {"name": "tool3", "arguments": "{}"}}
-            ])
-        ]
+        messages = list(assistant_tool_call_messages)
         
         print("Action: Merging messages...")
         result = merge_adjacent_messages(messages)
@@ -349,7 +396,7 @@ class TestMergeAdjacentMessages:
         print(f"Comparing tool IDs: Expected ['call_1', 'call_2', 'call_3'], Got {tool_ids}")
         assert tool_ids == ["call_1", "call_2", "call_3"]
     
-    def test_merges_assistant_with_and_without_tool_calls(self):
+    def test_merges_assistant_with_and_without_tool_calls(self, assistant_tool_call_messages):
         """
         What it does: Verifies merging of assistant with and without tool_calls.
         Purpose: Ensure tool_calls are correctly initialized when merging.
@@ -357,9 +404,7 @@ class TestMergeAdjacentMessages:
         print("Setup: Assistant without tool_calls + assistant with tool_calls...")
         messages = [
             UnifiedMessage(role="assistant", content="Thinking...", tool_calls=None),
-            UnifiedMessage(role="assistant", content="", tool_calls=[
-                {"id": "call_1", "type": "function", "function": {"name": "tool1", "arguments": "{}"}}
-            ])
+            assistant_tool_call_messages[0]
         ]
         
         print("Action: Merging messages...")
@@ -394,6 +439,25 @@ class TestMergeAdjacentMessages:
         assert len(result) == 1
         assert result[0].tool_results is not None
         assert len(result[0].tool_results) == 2
+    
+    def test_does_not_mutate_input_messages(self, assistant_tool_call_messages):
+        """
+        What it does: Verifies that merging leaves the input messages untouched.
+        Purpose: Ensure merged runs are built on copies, so inputs can be shared safely.
+        """
+        print("Setup: Shared assistant messages with tool_calls...")
+        messages = list(assistant_tool_call_messages)
+        
+        print("Action: Merging messages twice...")
+        merge_adjacent_messages(messages)
+        result = merge_adjacent_messages(messages)
+        
+        print(f"Comparing merged tool_calls count: Expected 3, Got {len(result[0].tool_calls)}")
+        assert len(result[0].tool_calls) == 3
+        print("Checking that input messages are unchanged...")
+        for i, msg in enumerate(assistant_tool_call_messages, start=1):
+            assert msg.content == ""
+            assert [tc["id"] for tc in msg.tool_calls] == [f"call_{i}"]
 
 
 # ==================================================================================================
@@ -487,6 +551,29 @@ class TestEnsureAssistantBeforeToolResults:
         assert result[2].tool_results[0]["tool_use_id"] == "call_123"
         assert stripped is False
     
+    def test_returns_same_list_when_nothing_stripped(self):
+        """
+        What it does: Verifies the input list is returned when no tool_results are orphaned.
+        Purpose: Ensure the common no-op path does not allocate a new list.
+        """
+        print("Setup: Messages with valid tool_results...")
+        messages = [
+            UnifiedMessage(role="user", content="Call a tool"),
+            UnifiedMessage(role="assistant", content="", tool_calls=[
+                {"id": "call_1", "type": "function", "function": {"name": "tool1", "arguments": "{}"}}
+            ]),
+            UnifiedMessage(role="user", content="", tool_results=[
+                {"type": "tool_result", "tool_use_id": "call_1", "content": "Result"}
+            ])
+        ]
+        
+        print("Action: Ensuring assistant before tool_results...")
+        result, stripped = ensure_assistant_before_tool_results(messages)
+        
+        print("Checking that the input list is returned unchanged...")
+        assert result is messages
+        assert stripped is False
+    
     def test_strips_orphaned_tool_results_at_start(self):
         """
         What it does: Verifies orphaned tool_results at the start are stripped.
@@ -714,6 +801,56 @@ class TestEnsureAssistantBeforeToolResults:
         assert result[2].tool_results[0]["tool_use_id"] == "call_valid"
         assert stripped is True  # Because orphaned ones were stripped
     
+    def test_strips_only_tool_results_without_matching_tool_call(self):
+        """
+        What it does: Verifies that tool_results with unknown tool_use_id are stripped individually.
+        Purpose: Ensure matching tool_results are kept while unmatched ones are removed.
+        """
+        print("Setup: Assistant with call_1, user with results for call_1 and call_unknown...")
+        messages = [
+            UnifiedMessage(role="assistant", content="", tool_calls=[
+                {"id": "call_1", "type": "function", "function": {"name": "tool1", "arguments": "{}"}}
+            ]),
+            UnifiedMessage(role="user", content="", tool_results=[
+                {"type": "tool_result", "tool_use_id": "call_1", "content": "Result 1"},
+                {"type": "tool_result", "tool_use_id": "call_unknown", "content": "Unknown"}
+            ])
+        ]
+        
+        print("Action: Ensuring assistant before tool_results...")
+        result, stripped = ensure_assistant_before_tool_results(messages)
+        
+        tool_ids = [tr["tool_use_id"] for tr in result[1].tool_results]
+        print(f"Comparing tool IDs: Expected ['call_1'], Got {tool_ids}")
+        assert tool_ids == ["call_1"]
+        assert stripped is True
+        print("Checking that the input message is not modified...")
+        assert len(messages[1].tool_results) == 2
+    
+    def test_keeps_kiro_format_tool_results_with_matching_tool_call(self):
+        """
+        What it does: Verifies that Kiro-format tool_results ("toolUseId") are matched to tool calls.
+        Purpose: Ensure results already in Kiro format aren't stripped as orphaned.
+        """
+        print("Setup: Assistant with call_1, user with Kiro-format results for call_1 and call_unknown...")
+        messages = [
+            UnifiedMessage(role="assistant", content="", tool_calls=[
+                {"id": "call_1", "type": "function", "function": {"name": "tool1", "arguments": "{}"}}
+            ]),
+            UnifiedMessage(role="user", content="", tool_results=[
+                {"content": [{"text": "Result 1"}], "status": "success", "toolUseId": "call_1"},
+                {"content": [{"text": "Unknown"}], "status": "success", "toolUseId": "call_unknown"}
+            ])
+        ]
+        
+        print("Action: Ensuring assistant before tool_results...")
+        result, stripped = ensure_assistant_before_tool_results(messages)
+        
+        tool_ids = [tr["toolUseId"] for tr in result[1].tool_results]
+        print(f"Comparing tool IDs: Expected ['call_1'], Got {tool_ids}")
+        assert tool_ids == ["call_1"]
+        assert stripped is True
+    
     def test_single_message_with_tool_results(self):
         """
         What it does: Verifies handling of single message with tool_results.
@@ -896,6 +1033,33 @@ class TestSanitizeJsonSchema:
         assert "required" not in nested
         assert "additionalProperties" not in nested
     
+    def test_keeps_definition_names_matching_skipped_fields(self):
+        """
+        What it does: Verifies names inside $defs/definitions/patternProperties are kept.
+        Purpose: Ensure a definition called "title" or "default" isn't dropped like a schema field.
+        """
+        print("Setup: Schema with name maps containing 'title' and 'default' entries...")
+        schema = {
+            "type": "object",
+            "$defs": {
+                "title": {"type": "string", "title": "Title"}
+            },
+            "definitions": {
+                "default": {"type": "object", "additionalProperties": False}
+            },
+            "patternProperties": {
+                "^x-": {"type": "string", "default": "x"}
+            }
+        }
+        
+        print("Action: Sanitizing schema...")
+        result = sanitize_json_schema(schema)
+        
+        print(f"Comparing result: {result}")
+        assert result["$defs"] == {"title": {"type": "string"}}
+        assert result["definitions"] == {"default": {"type": "object"}}
+        assert result["patternProperties"] == {"^x-": {"type": "string"}}
+    
     def test_sanitizes_items_in_lists(self):
         """
         What it does: Verifies sanitization of anyOf by simplifying to first non-null option.
@@ -961,6 +1125,125 @@ class TestSanitizeJsonSchema:
         assert "additionalProperties" not in result
         assert result["required"] == ["question", "options"]  # Non-empty required is preserved
         assert result["properties"]["question"]["type"] == "string"
+    
+    def test_reuses_cached_result_for_identical_schema(self):
+        """
+        What it does: Verifies that identical schemas are sanitized only once.
+        Purpose: Ensure repeated tool definitions hit the sanitization cache.
+        """
+        print("Setup: Two equal schemas built separately (same key order)...")
+        schema_a = {"type": "object", "properties": {"q": {"type": "string"}}, "required": []}
+        schema_b = {"type": "object", "properties": {"q": {"type": "string"}}, "required": []}
+        
+        print("Action: Sanitizing both schemas...")
+        result_a = sanitize_json_schema(schema_a)
+        result_b = sanitize_json_schema(schema_b)
+        
+        print(f"Result: {result_a}")
+        assert result_a == {"type": "object", "properties": {"q": {"type": "string"}}}
+        print("Checking that the cached result is reused...")
+        assert result_b is result_a
+        print("Checking that the input schema is not modified...")
+        assert schema_a["required"] == []
+    
+    def test_key_order_is_part_of_cache_key(self, json_backend):
+        """
+        What it does: Verifies that schemas differing only in key order don't share a cache entry.
+        Purpose: Ensure anyOf merging (later sibling keys win) gives the same result cached and uncached.
+        """
+        print("Setup: anyOf option and sibling description in both key orders...")
+        any_of = [{"type": "string", "description": "inner-order-test"}, {"type": "null"}]
+        schema_first = {"description": "outer-order-test", "anyOf": any_of}
+        schema_second = {"anyOf": any_of, "description": "outer-order-test"}
+        
+        print(f"Action: Sanitizing both schemas ({json_backend} cache key)...")
+        result_first = sanitize_json_schema(schema_first)
+        result_second = sanitize_json_schema(schema_second)
+        
+        print(f"Comparing results: {result_first} / {result_second}")
+        assert result_first == {"description": "inner-order-test", "type": "string"}
+        assert result_second == {"type": "string", "description": "outer-order-test"}
+    
+    def test_cache_key_preserves_key_order(self, json_backend):
+        """
+        What it does: Verifies the schema cache key digests the schema in insertion order.
+        Purpose: Ensure equal copies share a key, reordered schemas don't, for orjson and stdlib json.
+        """
+        print("Setup: Schema, an identical copy and a reordered copy...")
+        schema = {"type": "object", "properties": {"q": {"type": "string"}}}
+        same = {"type": "object", "properties": {"q": {"type": "string"}}}
+        reordered = {"properties": {"q": {"type": "string"}}, "type": "object"}
+        
+        print(f"Action: Building cache keys ({json_backend})...")
+        key = _schema_cache_key(schema)
+        
+        print(f"Comparing keys: {key.hex()}")
+        assert len(key) == 16
+        assert _schema_cache_key(same) == key
+        assert _schema_cache_key(reordered) != key
+    
+    def test_nan_and_null_schemas_get_different_cache_keys(self, json_backend):
+        """
+        What it does: Verifies a schema with NaN doesn't share a cache entry with one with null.
+        Purpose: Ensure orjson writing NaN as null can't make a valid schema get a cached NaN result.
+        """
+        print(f"Setup: Schemas with minimum=NaN and minimum=None ({json_backend})...")
+        schema_nan = {"type": "number", "minimum": float("nan"), "title": "x"}
+        schema_null = {"type": "number", "minimum": None, "title": "x"}
+        
+        print("Action: Building cache keys and sanitizing both schemas...")
+        key_nan = _schema_cache_key(schema_nan)
+        key_null = _schema_cache_key(schema_null)
+        result_nan = sanitize_json_schema(schema_nan)
+        result_null = sanitize_json_schema(schema_null)
+        
+        print(f"Comparing results: {result_nan} / {result_null}")
+        assert key_nan != key_null
+        assert math.isnan(result_nan["minimum"])
+        assert result_null == {"type": "number", "minimum": None}
+    
+    def test_returns_clean_schema_without_copying(self):
+        """
+        What it does: Verifies that a schema without problematic fields is returned as-is.
+        Purpose: Ensure clean schemas skip the rebuild entirely.
+        """
+        print("Setup: Clean schema...")
+        schema = {
+            "type": "object",
+            "properties": {"title": {"type": "string"}},
+            "required": ["title"]
+        }
+        
+        print("Action: Sanitizing schema...")
+        result = sanitize_json_schema(schema)
+        
+        print("Checking that the input schema is returned...")
+        assert result is schema
+    
+    def test_handles_schema_deeper_than_recursion_limit(self):
+        """
+        What it does: Verifies sanitization of a schema nested deeper than the recursion limit.
+        Purpose: Ensure the iterative walk does not raise RecursionError on pathological schemas.
+        """
+        import sys
+        
+        depth = sys.getrecursionlimit() + 100
+        print(f"Setup: Schema nested {depth} levels deep...")
+        schema = {"type": "array", "additionalProperties": False}
+        innermost = schema
+        for _ in range(depth):
+            innermost["items"] = {"type": "array", "additionalProperties": False}
+            innermost = innermost["items"]
+        
+        print("Action: Sanitizing schema...")
+        result = sanitize_json_schema(schema)
+        
+        print("Checking every level is sanitized...")
+        level = result
+        for _ in range(depth):
+            assert "additionalProperties" not in level
+            level = level["items"]
+        assert level == {"type": "array"}
 
 
 # ==================================================================================================
@@ -1303,6 +1586,56 @@ class TestExtractToolUses:
         assert result[0]["name"] == "get_weather"
         assert result[0]["toolUseId"] == "call_123"
     
+    def test_parses_arguments_like_json_loads(self, json_backend):
+        """
+        What it does: Verifies string arguments parse the same as json.loads().
+        Purpose: Ensure the orjson fast path keeps stdlib behavior, including NaN and big integers.
+        """
+        print(f"Setup: tool_calls with Unicode, NaN and big integers in arguments ({json_backend})...")
+        tool_calls = [
+            {
+                "id": "call_nan",
+                "function": {"name": "search", "arguments": '{"city": "Москва", "limit": 3, "score": NaN}'}
+            },
+            {
+                # Valid JSON for orjson too - must not take a lossy float path
+                "id": "call_big",
+                "function": {
+                    "name": "transfer",
+                    "arguments": '{"account": 123456789012345678901234567890, "offset": -9223372036854775809}'
+                }
+            }
+        ]
+        
+        print("Action: Extracting tool uses...")
+        result = extract_tool_uses_from_message(content="", tool_calls=tool_calls)
+        
+        print(f"Result: {result}")
+        input_data = result[0]["input"]
+        assert input_data["city"] == "Москва"
+        assert input_data["limit"] == 3
+        assert math.isnan(input_data["score"])
+        print("Checking that integers wider than 64 bits stay exact...")
+        assert result[1]["input"] == {
+            "account": 123456789012345678901234567890,
+            "offset": -9223372036854775809
+        }
+    
+    def test_invalid_arguments_raise_json_decode_error(self, json_backend):
+        """
+        What it does: Verifies invalid JSON arguments raise json.JSONDecodeError.
+        Purpose: Ensure callers see the same exception type with or without orjson.
+        """
+        print(f"Setup: tool_calls with malformed arguments ({json_backend})...")
+        tool_calls = [{
+            "id": "call_bad",
+            "function": {"name": "search", "arguments": '{"query": '}
+        }]
+        
+        print("Action: Extracting tool uses (expecting JSONDecodeError)...")
+        with pytest.raises(json.JSONDecodeError):
+            extract_tool_uses_from_message(content="", tool_calls=tool_calls)
+    
     def test_extracts_from_content_list(self):
         """
         What it does: Verifies extraction from content list.
@@ -1417,6 +1750,25 @@ class TestProcessToolsWithLongDescriptions:
         assert processed[0].description == "Get weather for a location"
         assert doc == ""
     
+    def test_returns_same_list_when_all_descriptions_short(self):
+        """
+        What it does: Verifies the input list is returned as-is when no description is too long.
+        Purpose: Ensure the common case doesn't copy the tools list.
+        """
+        print("Setup: Tools with short descriptions...")
+        tools = [
+            UnifiedTool(name="tool_a", description="Short A", input_schema={}),
+            UnifiedTool(name="tool_b", description=None, input_schema={}),
+        ]
+        
+        print("Action: Processing tools...")
+        with patch('kiro.converters_core.TOOL_DESCRIPTION_MAX_LENGTH', 100):
+            processed, doc = process_tools_with_long_descriptions(tools)
+        
+        print("Checking that the same list object is returned...")
+        assert processed is tools
+        assert doc == ""
+    
     def test_long_description_moved_to_system_prompt(self):
         """
         What it does: Verifies moving long description to system prompt.
@@ -6,6 +6,7 @@ Tests retry logic, error handling, and HTTP client management.
 """
 
 import asyncio
+import json
 import pytest
 from unittest.mock import AsyncMock, Mock, patch, MagicMock
 from datetime import datetime, timezone, timedelta
@@ -13,7 +14,7 @@ from datetime import datetime, timezone, timedelta
 import httpx
 from fastapi import HTTPException
 
-from kiro.http_client import KiroHttpClient
+from kiro.http_client import KiroHttpClient, _encode_json_body
 from kiro.auth import KiroAuthManager
 from kiro.config import MAX_RETRIES, BASE_RETRY_DELAY, FIRST_TOKEN_MAX_RETRIES, STREAMING_READ_TIMEOUT
 
@@ -29,6 +30,14 @@ def mock_auth_manager_for_http():
     return manager
 
 
+@pytest.fixture(params=["orjson", "json"])
+def json_backend(request, monkeypatch):
+    """Runs a test once with orjson and once with the stdlib json fallback."""
+    backend = pytest.importorskip("orjson") if request.param == "orjson" else None
+    monkeypatch.setattr("kiro.http_client.orjson", backend)
+    return request.param
+
+
 class TestKiroHttpClientInitialization:
     """Tests for KiroHttpClient initialization."""
     
@@ -278,6 +287,41 @@ class TestKiroHttpClientRequestWithRetry:
         mock_sleep.assert_called_once()
         assert response.status_code == 200
     
+    @pytest.mark.asyncio
+    async def test_retries_send_same_serialized_body(self, mock_auth_manager_for_http):
+        """
+        What it does: Verifies the JSON body is serialized once and reused on retry.
+        Purpose: Ensure every attempt sends identical pre-encoded bytes.
+        """
+        print("Setup: Creating KiroHttpClient...")
+        http_client = KiroHttpClient(mock_auth_manager_for_http)
+        
+        mock_response_429 = AsyncMock()
+        mock_response_429.status_code = 429
+        
+        mock_response_200 = AsyncMock()
+        mock_response_200.status_code = 200
+        
+        mock_client = AsyncMock()
+        mock_client.is_closed = False
+        mock_client.request = AsyncMock(side_effect=[mock_response_429, mock_response_200])
+        
+        print("Action: Executing request...")
+        with patch.object(http_client, '_get_client', return_value=mock_client):
+            with patch('kiro.http_client.get_kiro_headers', return_value={}):
+                with patch('kiro.http_client.asyncio.sleep', new_callable=AsyncMock):
+                    await http_client.request_with_retry(
+                        "POST",
+                        "https://api.example.com/test",
+                        {"data": "значение"}
+                    )
+        
+        bodies = [call.kwargs["content"] for call in mock_client.request.call_args_list]
+        print(f"Comparing bodies: {bodies}")
+        assert len(bodies) == 2
+        assert bodies[0] is bodies[1]
+        assert json.loads(bodies[0]) == {"data": "значение"}
+    
     @pytest.mark.asyncio
     async def test_5xx_triggers_backoff(self, mock_auth_manager_for_http):
         """
@@ -1021,4 +1065,60 @@ class TestKiroHttpClientGracefulClose:
             mock_logger.warning.assert_called_once()
             warning_message = str(mock_logger.warning.call_args)
             print(f"Warning message: {warning_message}")
-            assert "Connection reset" in warning_message or "Error closing" in warning_message
\ No newline at end of file
+            assert "Connection reset" in warning_message or "Error closing" in warning_message
+
+
+class TestEncodeJsonBody:
+    """Tests for _encode_json_body (request body serialization)."""
+    
+    def test_encodes_compact_utf8_json(self, json_backend):
+        """
+        What it does: Verifies the body is encoded as compact UTF-8 JSON.
+        Purpose: Ensure orjson and stdlib json produce the same bytes as httpx json=.
+        """
+        print(f"Setup: Body with nested data and non-ASCII text ({json_backend})...")
+        data = {"content": "Привет", "items": [1, 2.5, None, True], "nested": {"key": "value"}}
+        
+        print("Action: Encoding body...")
+        body = _encode_json_body(data)
+        
+        expected = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        print(f"Comparing body: Expected {expected!r}, Got {body!r}")
+        assert body == expected
+    
+    @pytest.mark.parametrize("value", [float("nan"), float("inf"), float("-inf")])
+    def test_raises_for_non_finite_floats(self, json_backend, value):
+        """
+        What it does: Verifies NaN and Infinity in the body raise ValueError.
+        Purpose: Ensure orjson doesn't silently send null where stdlib json would fail.
+        """
+        print(f"Setup: Body with {value} nested in a list ({json_backend})...")
+        data = {"toolUses": [{"input": {"score": value}}]}
+        
+        print("Action: Encoding body (expecting ValueError)...")
+        with pytest.raises(ValueError):
+            _encode_json_body(data)
+    
+    @pytest.mark.asyncio
+    async def test_request_with_non_finite_float_is_not_sent(self, mock_auth_manager_for_http, json_backend):
+        """
+        What it does: Verifies request_with_retry raises ValueError for a NaN body without sending.
+        Purpose: Ensure the outcome doesn't depend on whether orjson is installed.
+        """
+        print(f"Setup: Creating KiroHttpClient ({json_backend})...")
+        http_client = KiroHttpClient(mock_auth_manager_for_http)
+        
+        mock_client = AsyncMock()
+        mock_client.is_closed = False
+        
+        print("Action: Executing request with NaN in body...")
+        with patch.object(http_client, '_get_client', return_value=mock_client):
+            with pytest.raises(ValueError):
+                await http_client.request_with_retry(
+                    "POST",
+                    "https://api.example.com/test",
+                    {"data": float("nan")}
+                )
+        
+        print("Verification: request() not called...")
+        mock_client.request.assert_not_called()
@@ -496,6 +496,21 @@ class TestAwsEventStreamParserFeed:
         assert events[0]["type"] == "context_usage"
         assert events[0]["data"] == 25.5
     
+    def test_parses_mixed_events_in_stream_order(self, aws_event_parser):
+        """
+        Что он делает: Проверяет, что события разных типов возвращаются в порядке следования в потоке.
+        Цель: Убедиться, что ближайшее событие находится независимо от порядка EVENT_PATTERNS.
+        """
+        print("Настройка: Chunk с usage, context usage и content...")
+        chunk = b'{"usage":1.5}{"contextUsagePercentage":25.5}{"content":"Hello"}'
+        
+        print("Действие: Парсинг chunk...")
+        events = aws_event_parser.feed(chunk)
+        
+        print(f"Результат: {events}")
+        assert [event["type"] for event in events] == ["usage", "context_usage", "content"]
+        assert events[2]["data"] == "Hello"
+    
     def test_handles_incomplete_json(self, aws_event_parser):
         """
         Что он делает: Проверяет обработку неполного JSON.